@@ -0,0 +1,358 @@
+# --- Shared patch scanner for analyze_patch.py (v1.0) and analyze_patch_saving.py (v2.0.0) ---
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import chain
+import os
+import stat
+import mmap
+import multiprocessing
+
+# --- Regex (v16.x format, byte patterns) ---
+# Compiled once per process at import: the per-line loop calls .match()
+# directly instead of going through the re module cache.
+
+# Block header: (Base58 ID) (space) (A+/D+) (space) (count)
+_BLOCK_HEADER_RE = re.compile(rb'^([\w\d]+)\s+([AD]\+)\s+(\d+)$')
+
+# Other commands (a, d, a*, d*, M, R)
+_CMD_AD_RE = re.compile(rb'^[\w\d,-]+\s+[ad].*$')
+_CMD_MR_RE = re.compile(rb'^[\w\d,-]+\s+[MR].*$')
+
+# Variable usages '@(Base58 ID)' and literal headers '#(\d+)(space)' in one
+# alternation, so each command line is scanned once. Neither form can start
+# inside the other, so matches are identical to two separate passes.
+_USAGE_GAP_RE = re.compile(rb'(@[\w\d]+)|#(\d+)\s')
+
+# Command chunks buffered before each Counter pass (bounds memory while streaming)
+_COUNT_BATCH_SIZE = 4096
+
+def _count_tokens(token_counts, chunks):
+    """
+    Adds the usages/literals found in `chunks` to `token_counts`, then empties `chunks`.
+    findall() yields (var_name, b'') for usages and (b'', len) for literals.
+    """
+    # Joined with b'\0', not b'\n': '#<len>\s' must not match across lines.
+    token_counts.update(_USAGE_GAP_RE.findall(b'\0'.join(chunks)))
+    chunks.clear()
+
+def _map_file(file_path):
+    """
+    Returns (source, size_b). A non-empty regular file is read through a
+    read-only mmap, so lines come straight from the page cache. Anything else
+    (empty files, pipes, FIFOs, /dev/stdin) cannot be mapped and is streamed
+    from the open file instead.
+    """
+    f = open(file_path, 'rb')
+    info = os.fstat(f.fileno())
+    if stat.S_ISREG(info.st_mode) and info.st_size > 0:
+        with f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), info.st_size
+    return f, info.st_size
+
+# --- Main parser logic ---
+
+@dataclass(slots=True)
+class Stats:
+    """
+    Counters and derived values returned by scan_patch().
+    """
+    total_lines: int = 0
+    total_size_b: int = 0
+    compression_flag: bool = False
+    definition_lines: int = 0
+    definition_size_b: int = 0
+    definition_at_overhead_b: int = 0 # (H2)
+    command_lines: int = 0
+    command_size_b: int = 0
+    command_at_overhead_b: int = 0  # (H3, v1.0) Overhead from '@' in usage
+    literal_gap_overhead_b: int = 0 # (H4)
+    block_prefix_overhead_b: int = 0# (H1)
+    other_lines: int = 0
+    other_size_b: int = 0
+
+    # --- [v2.0.0] Efficiency Statistics ---
+    # (H3, v2.0.0) Total cost of all references (e.g. '@bY', '@0')
+    total_reference_cost_b: int = 0
+    # Total "weight" of original content that was replaced
+    total_replaced_bytes: int = 0
+
+    # [v2.0.0] Separation by type (variable counts)
+    full_line_vars: int = 0
+    fragment_vars: int = 0
+
+    full_line_replaced_b: int = 0
+    full_line_ref_cost_b: int = 0
+
+    fragment_replaced_b: int = 0
+    fragment_ref_cost_b: int = 0
+
+    # [v2.0.0] Definition cost by type: (H2) Overhead + ' ' + content
+    def_cost_full_b: int = 0
+    def_cost_fragment_b: int = 0
+
+    # --- Post-Analysis ---
+    defined_vars: int = 0
+    unused_vars: list = field(default_factory=list) # [var_name]
+    unused_size_b: int = 0
+    undefined_vars: list = field(default_factory=list) # [var_name] used but never defined
+    undefined_refs: int = 0
+    # [(var_name, count, content or None if never defined, "FULL"/"FRAG")]
+    top_used_vars: list = field(default_factory=list)
+
+def scan_patch(file_path):
+    """
+    Scans a compressed patch and returns its Stats, used by both reports.
+    Raises OSError if the file cannot be read.
+    """
+    stats = Stats()
+
+    # Names and contents are kept as raw bytes; decoded only for output
+    defined_vars = {} # {var_name: content}
+    # Command/block content, counted in batches of _COUNT_BATCH_SIZE
+    command_chunks = []
+    token_counts = Counter()
+
+    # [v2.0.0] Heuristic: "Full line" = content > 5 characters AND
+    # (starts with whitespace) OR (ends with '}' or ';')
+    # This is rough but should separate " \t\t}" from " return".
+
+    # Raw bytes, line by line: no decode/encode round-trip, no whole-file copy
+    source, stats.total_size_b = _map_file(file_path)
+
+    in_block = False
+    block_lines_remaining = 0
+
+    # Hot-loop counters live in locals and are stored on stats afterwards
+    definition_lines = definition_size_b = 0
+    command_lines = command_size_b = 0
+    block_prefix_overhead_b = 0
+    other_lines = other_size_b = 0
+
+    # [v2.0.0] Separation by type: {var_name}
+    full_line_vars = set()
+    fragment_vars = set()
+
+    with source:
+        # Both cycles consume the same enumerate(), so the file is read once
+        lines = enumerate(iter(source.readline, b''))
+        line_num = -1
+        first_command = []
+
+        # --- [v2.0.0] Cycle 1: Collect Definitions ---
+        # (We must collect *all* definitions *before* analyzing commands)
+
+        for line_num, line in lines:
+            # Binary mode does no newline translation; CRLF patches are valid input
+            line = line.rstrip(b'\r\n')
+            line_len_b = len(line)
+
+            if line_num == 0 and line == b'~':
+                stats.compression_flag = True
+                continue
+
+            # Only '@' lines can be definitions
+            if line[:1] == b'@':
+                sp = line.find(b' ')
+                if sp > 1 and line[1:sp].isalnum():
+                    var_name = line[:sp]
+                    content = line[sp + 1:]
+                    defined_vars[var_name] = content
+
+                    definition_lines += 1
+                    definition_size_b += line_len_b
+
+                    # [v2.0.0] Heuristic (length in characters; ASCII needs no decode)
+                    if content.isascii():
+                        content_chars = len(content)
+                    else:
+                        content_chars = len(content.decode('utf-8', 'replace'))
+                    if content_chars > 5 and (content[:1].isspace() or content.endswith((b'}', b';'))):
+                        full_line_vars.add(var_name)
+                    else:
+                        fragment_vars.add(var_name)
+
+                    continue
+
+                if sp < 0 and len(line) > 1 and line[1:].isalnum(): # For empty ones
+                    var_name = line
+                    defined_vars[var_name] = b""
+                    definition_lines += 1
+                    definition_size_b += line_len_b
+                    fragment_vars.add(var_name) # Empty = fragments
+                    continue
+
+            # First line that is not a definition = end of block;
+            # it is handed over to Cycle 2
+            first_command.append((line_num, line))
+            break
+
+        # One slot per definition, allocated in one go; usages of names that
+        # were never defined (malformed patch) are kept apart
+        used_vars_count = dict.fromkeys(defined_vars, 0) # {var_name: count}
+        undefined_vars_count = {} # {var_name: count}
+
+        # --- [v2.0.0] Cycle 2: Command Analysis ---
+        # (defined_vars is complete here and is only read from now on)
+
+        for line_num, line in chain(first_command, lines):
+            line = line.rstrip(b'\r\n')
+            line_len_b = len(line)
+
+            if len(command_chunks) >= _COUNT_BATCH_SIZE:
+                _count_tokens(token_counts, command_chunks)
+
+            if in_block:
+                command_lines += 1
+                command_size_b += line_len_b
+                content = line
+
+                if line.startswith((b'a ', b'd ', b'A ', b'D ')):
+                    block_prefix_overhead_b += 2 # (H1)
+                    content = line[2:]
+
+                # Usages and literals are counted in batches
+                command_chunks.append(content)
+
+                block_lines_remaining -= 1
+                if block_lines_remaining == 0:
+                    in_block = False
+                continue
+
+            # (Not in block, not definition)
+            # '@' never starts a header or command
+            if line[:1] != b'@':
+                # Substring test skips the header regex on most lines
+                if b'A+' in line or b'D+' in line:
+                    block_match = _BLOCK_HEADER_RE.match(line)
+                    if block_match:
+                        command_lines += 1
+                        command_size_b += line_len_b
+                        block_lines_remaining = int(block_match.group(3))
+                        in_block = block_lines_remaining > 0
+                        continue
+
+                if _CMD_AD_RE.match(line) or _CMD_MR_RE.match(line):
+                    command_lines += 1
+                    command_size_b += line_len_b
+                    command_chunks.append(line)
+                    continue
+
+            other_lines += 1
+            other_size_b += line_len_b
+
+    # Last index of the shared enumerate() (-1 for an empty file)
+    stats.total_lines = line_num + 1
+    stats.definition_lines = definition_lines
+    stats.definition_size_b = definition_size_b
+    stats.definition_at_overhead_b = definition_lines # (H2) One '@' per definition
+    stats.command_lines = command_lines
+    stats.command_size_b = command_size_b
+    stats.block_prefix_overhead_b = block_prefix_overhead_b
+    stats.other_lines = other_lines
+    stats.other_size_b = other_size_b
+
+    # --- Usage Analysis (H3 + Benefit) ---
+    # Count the last batch; costs are then computed per name.
+    _count_tokens(token_counts, command_chunks)
+    for (full_var_name, gap_len_str), count in token_counts.items():
+        if not full_var_name:
+            # (H4) Overhead: '#', digits and space
+            stats.literal_gap_overhead_b += (len(gap_len_str) + 2) * count
+            continue
+
+        stats.command_at_overhead_b += count # (H3, v1.0)
+        ref_cost_b = len(full_var_name) * count
+        stats.total_reference_cost_b += ref_cost_b # (H3)
+
+        if full_var_name not in used_vars_count:
+            undefined_vars_count[full_var_name] = count
+        else:
+            used_vars_count[full_var_name] = count # e.g. '@bY'
+            replaced_b = len(defined_vars[full_var_name]) * count
+            stats.total_replaced_bytes += replaced_b
+
+            # [v2.0.0] Separation
+            if full_var_name in full_line_vars:
+                stats.full_line_replaced_b += replaced_b
+                stats.full_line_ref_cost_b += ref_cost_b
+            else:
+                stats.fragment_replaced_b += replaced_b
+                stats.fragment_ref_cost_b += ref_cost_b
+
+    # --- Post-Analysis ---
+    # Only small derived values are kept, so pool workers return little data
+
+    stats.full_line_vars = len(full_line_vars)
+    stats.fragment_vars = len(fragment_vars)
+
+    # [v2.0.0] Definition cost by type: (H2) Overhead + ' ' + content
+    # Fragments are "everything not full", as in the Top 10 [FULL]/[FRAG] tag
+    def_cost_b = sum(2 + len(content) for content in defined_vars.values())
+    stats.def_cost_full_b = sum(2 + len(defined_vars[var_name]) for var_name in full_line_vars)
+    stats.def_cost_fragment_b = def_cost_b - stats.def_cost_full_b
+
+    unused_vars = [var_name for var_name, count in used_vars_count.items() if count == 0]
+    stats.defined_vars = len(defined_vars)
+    stats.unused_vars = [var_name.decode('ascii') for var_name in unused_vars]
+    # +1 for '@' (H2), +1 for ' ', +N for content
+    stats.unused_size_b = sum(2 + len(defined_vars[var_name]) for var_name in unused_vars)
+
+    stats.undefined_vars = [var_name.decode('ascii') for var_name in undefined_vars_count]
+    stats.undefined_refs = sum(undefined_vars_count.values())
+
+    used_vars = chain(((var_name, count) for var_name, count in used_vars_count.items() if count),
+                      undefined_vars_count.items())
+    sorted_usage = sorted(used_vars, key=lambda item: item[1], reverse=True)
+    stats.top_used_vars = [
+        # (var_name, count, content or None if never defined, "FULL"/"FRAG")
+        (var_name.decode('ascii'), count,
+         defined_vars[var_name].decode('utf-8', 'replace') if var_name in defined_vars else None,
+         "FULL" if var_name in full_line_vars else "FRAG")
+        for var_name, count in sorted_usage[:10]
+    ]
+    return stats
+
+# --- Shared report sections ---
+
+def print_names(names):
+    """
+    Prints the names as a '(List: ...)', or the first 10 as '(Examples: ... ...)'.
+    """
+    if len(names) > 10:
+        print(f"  (Examples: {', '.join(names[:10])} ...)\n")
+    else:
+        print(f"  (List: {', '.join(names)})\n")
+
+def report_undefined_refs(stats):
+    """
+    Prints the data-integrity check for usages of names that were never defined.
+    """
+    print("--- REVISION: Undefined References ---")
+    undefined_vars = stats.undefined_vars
+
+    if not undefined_vars:
+        print("  ✅ NO references to undefined variables found.\n")
+    else:
+        print(f"  🔥 UNDEFINED VARIABLES USED: {len(undefined_vars)} ({stats.undefined_refs} references)")
+        print_names(undefined_vars)
+
+# --- Command line ---
+
+def run(file_paths, analyze, report):
+    """
+    Runs analyze() on every path, in a process pool when there are several,
+    and calls report() for each result in argument order. analyze() returns
+    (stats, None) or (None, error message); errors are printed here, in order.
+    """
+    if len(file_paths) > 1:
+        with multiprocessing.Pool() as pool:
+            results = pool.map(analyze, file_paths)
+    else:
+        results = [analyze(file_paths[0])]
+
+    for file_path, (stats, error) in zip(file_paths, results):
+        if error is not None:
+            print(error)
+        else:
+            report(stats, file_path)